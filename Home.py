@@ -1,20 +1,25 @@
 import streamlit as st
 
 
-def main():
-    page_title = "TWY's Playground"
-    page_icon = "📚"
+page_title = "TWY's Playground"
+page_icon = "📚"
 
-    st.set_page_config(
-        page_title=page_title,
-        page_icon=page_icon,
-        layout="centered"
-    )
+st.set_page_config(
+    page_title=page_title,
+    page_icon=page_icon,
+    layout="centered"
+)
 
-    st.write(f"## {page_icon} {page_title}")
 
-    st.write(
-        """
+@st.cache_data(ttl=24*60*60)
+def home_text():
+    """
+    Return the markdown text of the home page
+    """
+
+    return f"""
+        ## {page_icon} {page_title}
+
         ### What this site is for
         
         * This site is for my students and currently covers the following
@@ -60,10 +65,15 @@ def main():
         * TWY teaches engineering mathematics, signals and systems,
           technical writing, etc., at Korea University.
         """
-    )
-    with st.expander("Lecture videos (in Korean)"):
-        st.write(
-        """
+
+
+@st.cache_data(ttl=24*60*60)
+def lecture_videos_text():
+    """
+    Return the markdown list of lecture videos
+    """
+
+    return """
         - [Demystifying Gen AI: LLMs and Agents](https://youtu.be/sTNG4LbFTTA), 2024
         - [Linear Algebra](https://youtube.com/playlist?list=PLIzv0-ErbDpwNdtK1OZ7Ew54s3tlXzX4Q),
           2019
@@ -80,7 +90,17 @@ def main():
         - [Foundations of Mathematics and Kurt Friedrich Gödel](https://youtu.be/RMvVxr8czTU),
           2013
         """
-        )
+
+
+@st.fragment
+def show_home():
+    """
+    Show the static contents of the home page
+    """
+
+    st.markdown(home_text())
+    with st.expander("Lecture videos (in Korean)"):
+        st.markdown(lecture_videos_text())
 
     c1, c2, c3 = st.columns(3)
     c1.info('**[Email](mailto:yoon.tw@gmail.com)**', icon="✉️")
@@ -88,5 +108,9 @@ def main():
     c3.info('**[GitHub](https://github.com/twy80)**', icon="💻")
 
 
+def main():
+    show_home()
+
+
 if __name__ == "__main__":
     main()
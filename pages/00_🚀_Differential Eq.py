@@ -2,40 +2,158 @@
 Simulation of an RLC circuit by T.-W. Yoon, Jan. 2023
 """
 
+import cmath
+import math
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 from scipy.integrate import odeint
 import streamlit as st
+from io import BytesIO
 
 
 # Differential equation of an RLC circuit
 def rlc_eqn(x, t, *args):
     resistor, inductor, capacitor, input_choice = args
+    v_c, i = x.tolist()
 
-    voltage = 1. if input_choice == "Unit step" else np.sin(np.pi*t)
-    
-    return [
-        0*x[0] + (1/capacitor)*x[1],
-        (-1/inductor)*x[0] + (-resistor/inductor)*x[1] + (1/inductor)*voltage
-    ]
+    # math.sin avoids numpy's ufunc dispatch on a scalar
+    voltage = 1. if input_choice == "Unit step" else math.sin(math.pi*t)
+
+    return (
+        i / capacitor,
+        (voltage - v_c - resistor*i) / inductor
+    )
 
 
 def rlc_eqn_jacobian(x, t, *args):
     resistor, inductor, capacitor, _ = args
 
-    return [
+    return np.array([
         [0, 1/capacitor],
         [-1/inductor, -resistor/inductor]
-    ]
+    ])
+
+
+def rlc_eigenvalues(resistor, inductor, capacitor):
+    """
+    Return the roots of lambda^2 + (R/L) lambda + 1/(LC) = 0, i.e.
+    the eigenvalues of the Jacobian, without calling LAPACK.
+    """
+
+    a, b = resistor / inductor, 1 / (inductor * capacitor)
+    disc = a*a - 4*b
+    sqrt_disc = math.sqrt(disc) if disc >= 0 else cmath.sqrt(disc)
+
+    return (-a + sqrt_disc) / 2, (-a - sqrt_disc) / 2
+
+
+def lorenz(state, t, rho, sigma, beta):
+    # Python floats are much cheaper than numpy scalars in this callback
+    x, y, z = state.tolist()
+    return (
+        sigma * (y - x),
+        x * (rho - z) - y,
+        x * y - beta * z
+    )
+
+
+@st.cache_data(show_spinner=False)
+def solve_rlc(resistor, inductor, capacitor, input_choice):
+    """
+    Solve the RLC circuit equation; the results are cached so that
+    reruns with the same parameters skip the integration.
+
+    Returns:
+        (np.array, np.array, str): time, states, and odeint's message
+    """
+
+    t_rlc = np.linspace(0, 20, 501)
+    x_rlc_0 = [0, 0]  # Initial state
+    args_rlc = resistor, inductor, capacitor, input_choice
+
+    # The system is linear, so the Jacobian is built once and reused
+    jacobian = rlc_eqn_jacobian(x_rlc_0, None, *args_rlc)
+
+    x_rlc, infodict = odeint(
+        rlc_eqn, x_rlc_0, t_rlc, args_rlc,
+        Dfun=lambda x, t, *args: jacobian, full_output=True,
+    )
+
+    return t_rlc, x_rlc, infodict["message"]
+
+
+@st.cache_data(show_spinner=False)
+def solve_lorenz(rho):
+    """
+    Solve the Lorenz equation with sigma = 10 and beta = 8/3;
+    the results are cached for each value of rho.
+
+    Returns:
+        (np.array, np.array, str): time, states, and odeint's message
+    """
+
+    t_lorenz = np.linspace(0, 25, 5001)
+    x_lorenz_0 = [1.0, 1.0, 1.0]
+
+    sigma, beta = 10, 8/3.0
+    args_lorenz = rho, sigma, beta
+
+    x_lorenz, infodict = odeint(
+        lorenz, x_lorenz_0, t_lorenz, args_lorenz, full_output=True,
+    )
+
+    return t_lorenz, x_lorenz, infodict["message"]
+
+
+def figure_to_png(fig):
+    """
+    Render a figure to PNG bytes the way st.pyplot does, and close it
+    """
 
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+    plt.close(fig)
 
-def lorenz(x, t, *args):
-    rho, sigma, beta = args
-    return [
-        sigma * (x[1] - x[0]),
-        x[0] * (rho - x[2]) - x[1],
-        x[0] * x[1] - beta * x[2]
-    ]
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False)
+def plot_rlc(resistor, inductor, capacitor, input_choice, plot_opt):
+    """
+    Plot the RLC simulation results, and return the figure as PNG bytes
+    so that reruns with the same inputs skip rendering.
+    """
+
+    t_rlc, x_rlc, _ = solve_rlc(resistor, inductor, capacitor, input_choice)
+
+    if plot_opt == "Time responses & Phase portrait":
+        fig, ax = plt.subplots(1, 2)
+        ax[0].plot(t_rlc, x_rlc[:, 0], "g", label="$v_C(t)$")
+        ax[0].plot(t_rlc, x_rlc[:, 1], "b", label="$i(t)$")
+        ax[0].legend(loc="best")
+        ax[0].set_xlabel("Time")
+        ax[0].set_ylabel("State variables")
+        ax[0].set_title("Time responses")
+        ax[0].set_box_aspect(1)
+        ax[1].plot(x_rlc[:, 0], x_rlc[:, 1], "r")  # path
+        ax[1].plot(x_rlc[0, 0], x_rlc[0, 1], "o")
+        ax[1].set_xlabel("$v_C(t)$")
+        ax[1].set_ylabel("$i(t)$")
+        ax[1].yaxis.set_label_position("right")
+        ax[1].set_title("Phase portrait")
+        ax[1].set_box_aspect(1)
+    else:
+        fig, ax = plt.subplots(2, 1, sharex=True)
+        ax[0].set_title("Time Responses")
+        ax[0].plot(t_rlc, x_rlc[:, 0], "g")
+        ax[0].set_ylabel("$v_C(t)$")
+        ax[1].plot(t_rlc, x_rlc[:, 1], "b")
+        ax[1].set_ylabel("$i(t)$")
+        ax[1].set_xlabel("Time")
+    ax[0].set_xticks([0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20])
+
+    return figure_to_png(fig)
 
 
 def run_rlc():
@@ -90,12 +208,10 @@ def run_rlc():
             min_value=0.1, max_value=5.0, value=1.0, step=0.1, format="%.1f"
         )
 
-    t_rlc = np.linspace(0, 20, 501)
-    x_rlc_0 = [0, 0]  # Initial state
     args_rlc = resistor, inductor, capacitor, input_choice
 
     with right:
-        eigenvalues, _ = np.linalg.eig(rlc_eqn_jacobian(x_rlc_0, None, *args_rlc))
+        eigenvalues = rlc_eigenvalues(resistor, inductor, capacitor)
         st.write(
             f"""
             > **Eigenvalues of the system**
@@ -108,51 +224,100 @@ def run_rlc():
 
     # Solving the differential equation
     try:
-        x_rlc, infodict = odeint(
-            rlc_eqn, x_rlc_0, t_rlc, args_rlc,
-            Dfun=rlc_eqn_jacobian, full_output=True,
-        )
-        if infodict["message"] != "Integration successful.":
+        _, _, message = solve_rlc(*args_rlc)
+        if message != "Integration successful.":
             st.error("Numerical problems arise.", icon="🚨")
 
     except Exception as e:
         st.error(f"An error occurred: {e}", icon="🚨")
+        return
 
     st.write("")
     st.write("$\\hspace{0.07em}\\texttt{\small Simulations results}$")
     plot_opt = st.radio(
-        "$\\texttt{Simulations results}$",
+        "Simulations results",
         ("Time responses & Phase portrait", "Time responses only"),
         label_visibility="collapsed"
     )
 
+    st.image(plot_rlc(*args_rlc, plot_opt))
+
+
+def resample_path(path, no_of_points=2000):
+    """
+    Pick at most no_of_points points of a path, equally spaced in arc
+    length, so that long trajectories are cheaper to draw in 3D.
+    """
+
+    arc_length = np.concatenate(
+        ([0.0], np.cumsum(np.linalg.norm(np.diff(path, axis=0), axis=1)))
+    )
+    indices = np.searchsorted(
+        arc_length, np.linspace(0.0, arc_length[-1], no_of_points)
+    )
+
+    return path[np.unique(indices)]
+
+
+@st.cache_data(show_spinner=False)
+def plot_lorenz(rho, plot_opt, three_d=False):
+    """
+    Plot the Lorenz simulation results, and return the figure as PNG bytes
+    so that reruns with the same inputs skip rendering.
+
+    The phase portrait is projected onto the (x, z) plane unless three_d
+    is True; the 2D projection is much faster to draw than a 3D line.
+    """
+
+    t_lorenz, x_lorenz, _ = solve_lorenz(rho)
+    projection = "3d" if three_d else None
+
+    fig = plt.figure()
     if plot_opt == "Time responses & Phase portrait":
-        fig, ax = plt.subplots(1, 2)
-        ax[0].plot(t_rlc, x_rlc[:, 0], "g", label="$v_C(t)$")
-        ax[0].plot(t_rlc, x_rlc[:, 1], "b", label="$i(t)$")
-        ax[0].legend(loc="best")
-        ax[0].set_xlabel("Time")
-        ax[0].set_ylabel("State variables")
-        ax[0].set_title("Time responses")
-        ax[0].set_box_aspect(1)
-        ax[1].plot(x_rlc[:, 0], x_rlc[:, 1], "r")  # path
-        ax[1].plot(x_rlc[0, 0], x_rlc[0, 1], "o")
-        ax[1].set_xlabel("$v_C(t)$")
-        ax[1].set_ylabel("$i(t)$")
-        ax[1].yaxis.set_label_position("right")
-        ax[1].set_title("Phase portrait")
-        ax[1].set_box_aspect(1)
+        states = "$x(t)$", "$y(t)$", "$z(t)$"
+        colors = "k", "b", "g"
+        ax1 = np.empty(3, dtype=object)
+
+        for k in range(3):
+            ax1[k] = plt.subplot2grid((3, 2),  (k, 0), fig=fig)
+            ax1[k].plot(t_lorenz, x_lorenz[:,k], color=colors[k], alpha=0.8)
+            ax1[k].set_xlabel('Time')
+            ax1[k].set_ylabel(states[k])
+        ax1[0].set_title("Time responses")
+        ax2 = plt.subplot2grid(
+            (3, 2), (0, 1), projection=projection, rowspan=3, fig=fig
+        )
+        ax2.set_title("Phase portrait")
     else:
-        fig, ax = plt.subplots(2, 1, sharex=True)
-        ax[0].set_title("Time Responses")
-        ax[0].plot(t_rlc, x_rlc[:, 0], "g")
-        ax[0].set_ylabel("$v_C(t)$")
-        ax[1].plot(t_rlc, x_rlc[:, 1], "b")
-        ax[1].set_ylabel("$i(t)$")
-        ax[1].set_xlabel("Time")
-    ax[0].set_xticks([0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20])
+        ax2 = fig.add_subplot(111, projection=projection)
+
+    if three_d:
+        ax2.plot(x_lorenz[0, 0], x_lorenz[0, 1], x_lorenz[0, 2], "o")
+        path = resample_path(x_lorenz)
+        ax2.plot(path[:,0], path[:,1], path[:,2], color="r", alpha=0.5)
+        ax2.set_xlabel('$x$')
+        ax2.set_ylabel('$y$')
+        ax2.set_zlabel('$z$')
+        ax2.set_xticks([-20, -10, 0, 10, 20])
+        ax2.set_yticks([-20, -10, 0, 10, 20])
+        ax2.set_zticks([0, 10, 20, 30, 40])
+    else:
+        # Segments coloured by time show the direction of the trajectory
+        points = x_lorenz[:, [0, 2]]
+        segments = np.stack([points[:-1], points[1:]], axis=1)
+        path = LineCollection(
+            segments, cmap="plasma", array=t_lorenz[:-1], alpha=0.5
+        )
+        ax2.add_collection(path)
+        ax2.autoscale_view()
+        ax2.plot(x_lorenz[0, 0], x_lorenz[0, 2], "o")
+        ax2.set_xlabel('$x$')
+        ax2.set_ylabel('$z$')
+        ax2.set_xticks([-20, -10, 0, 10, 20])
+        ax2.set_yticks([0, 10, 20, 30, 40])
+        ax2.set_box_aspect(1)
 
-    st.pyplot(fig)
+    return figure_to_png(fig)
 
 
 def reset_initial_rho():
@@ -206,59 +371,26 @@ def run_lorenz():
         step=0.01, format="%.2f"
     )
 
-    t_lorenz = np.linspace(0, 25, 10001)
-    x_lorenz_0 = [1.0, 1.0, 1.0]
-
-    sigma, beta = 10, 8/3.0
-    rho = st.session_state.rho
-    args_lorenz = rho, sigma, beta
-
     # Solving the differential equation
     try:
-        x_lorenz, infodict = odeint(
-            lorenz, x_lorenz_0, t_lorenz, args_lorenz, full_output=True,
-        )
-        if infodict["message"] != "Integration successful.":
+        _, _, message = solve_lorenz(st.session_state.rho)
+        if message != "Integration successful.":
             st.error("Numerical problems arise.", icon="🚨")
 
     except Exception as e:
         st.error(f"An error occurred: {e}", icon="🚨")
+        return
 
     st.write("$\\hspace{0.07em}\\texttt{\small Simulations results}$")
     plot_opt = st.radio(
-        "$\\texttt{Simulations results}$",
+        "Simulations results",
         ("Time responses & Phase portrait", "Phase portrait only"),
         label_visibility="collapsed"
     )
+    three_d = st.checkbox("$\\texttt{3D phase portrait}$")
 
-    fig = plt.figure()
     try:
-        if plot_opt == "Time responses & Phase portrait":
-            states = "$x(t)$", "$y(t)$", "$z(t)$"
-            colors = "k", "b", "g"
-            ax1 = np.empty(3, dtype=object)
-
-            for k in range(3):
-                ax1[k] = plt.subplot2grid((3, 2),  (k, 0), fig=fig)
-                ax1[k].plot(t_lorenz, x_lorenz[:,k], color=colors[k], alpha=0.8)
-                ax1[k].set_xlabel('Time')
-                ax1[k].set_ylabel(states[k])
-            ax1[0].set_title("Time responses")
-            ax2 = plt.subplot2grid((3, 2), (0, 1), projection="3d", rowspan=3, fig=fig)
-            ax2.set_title("Phase portrait")
-        else:
-            ax2 = fig.add_subplot(111, projection='3d')
-
-        ax2.plot(x_lorenz[0, 0], x_lorenz[0, 1], x_lorenz[0, 2], "o")
-        ax2.plot(x_lorenz[:,0], x_lorenz[:,1], x_lorenz[:,2], color="r", alpha=0.5)
-        ax2.set_xlabel('$x$')
-        ax2.set_ylabel('$y$')
-        ax2.set_zlabel('$z$')
-        ax2.set_xticks([-20, -10, 0, 10, 20])
-        ax2.set_yticks([-20, -10, 0, 10, 20])
-        ax2.set_zticks([0, 10, 20, 30, 40])
-
-        st.pyplot(fig)
+        st.image(plot_lorenz(st.session_state.rho, plot_opt, three_d))
 
     except Exception:
         st.error(
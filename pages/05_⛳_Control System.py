@@ -3,36 +3,45 @@ Control of an inverted pendulum on a cart using PID control
 by T.-W. Yoon, Aug. 2023
 """
 
+import cmath
+import math
 import numpy as np
 from scipy.integrate import odeint
 import streamlit as st
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
+from matplotlib.patches import Rectangle
 # from matplotlib.animation import PillowWriter
 import streamlit.components.v1 as components
+from io import BytesIO
 
 
 # Define the dynamics of the pid controlled inverted pendulum
 def pendulum_cart_pid(state, time, *args):
     m_c, m_p, length, b, g, kp, ki, kd = args
-    x, x_dot, theta, theta_dot, eta = state
+    x, x_dot, theta, theta_dot, eta = state.tolist()
+
+    # Common terms are evaluated once, using math for scalar arguments
+    sin_theta, cos_theta = math.sin(theta), math.cos(theta)
+    theta_dot_sq = theta_dot * theta_dot
 
     control = -kp * theta - ki * eta - kd * theta_dot
+    force = control - b * x_dot
+    denominator = m_c + m_p * sin_theta * sin_theta
 
     x_double_dot = (
-        m_p * np.sin(theta) * (g * np.cos(theta) - length * theta_dot ** 2)
-        + control - b * x_dot
-    ) / (m_c + m_p * np.sin(theta) ** 2)
+        m_p * sin_theta * (g * cos_theta - length * theta_dot_sq) + force
+    ) / denominator
 
     theta_double_dot = (
-        (m_c + m_p) * g * np.sin(theta)
-        - m_p * length * theta_dot ** 2 * np.sin(theta) * np.cos(theta)
-        + (control - b * x_dot) * np.cos(theta)
-    ) / (length * (m_c + m_p * np.sin(theta) ** 2))
+        (m_c + m_p) * g * sin_theta
+        - m_p * length * theta_dot_sq * sin_theta * cos_theta
+        + force * cos_theta
+    ) / (length * denominator)
 
     eta_dot = theta
 
-    return [x_dot, x_double_dot, theta_dot, theta_double_dot, eta_dot]
+    return x_dot, x_double_dot, theta_dot, theta_double_dot, eta_dot
 
 
 def print_root(value):
@@ -42,6 +51,154 @@ def print_root(value):
     return value
 
 
+def cubic_roots(a_1, a_2, a_3):
+    """
+    Return the roots of s^3 + a_1 s^2 + a_2 s + a_3 = 0 by Cardano's
+    formula, in descending order of their real parts
+    """
+
+    delta_0 = a_1 * a_1 - 3 * a_2
+    delta_1 = 2 * a_1 ** 3 - 9 * a_1 * a_2 + 27 * a_3
+    if delta_0 == 0 and delta_1 == 0:  # Triple root
+        return [complex(-a_1 / 3)] * 3
+
+    # Choose the sign of the square root that keeps c away from zero
+    sqrt_disc = cmath.sqrt(delta_1 * delta_1 - 4 * delta_0 ** 3)
+    if abs(delta_1 - sqrt_disc) > abs(delta_1 + sqrt_disc):
+        sqrt_disc = -sqrt_disc
+    c = ((delta_1 + sqrt_disc) / 2) ** (1 / 3)
+    xi = complex(-0.5, math.sqrt(3) / 2)  # Primitive cube root of unity
+
+    roots = [
+        -(a_1 + xi ** k * c + delta_0 / (xi ** k * c)) / 3 for k in range(3)
+    ]
+
+    return sorted(roots, key=lambda root: (-root.real, -root.imag))
+
+
+def figure_to_png(fig):
+    """
+    Render a figure to PNG bytes the way st.pyplot does, and close it
+    """
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+    plt.close(fig)
+
+    return buffer.getvalue()
+
+
+@st.cache_data(show_spinner=False)
+@plt.rc_context({'font.size': 7})
+def plot_trajectories(times, positions, angles):
+    """
+    Plot the cart position and the pendulum angle over time, and return
+    the figure as PNG bytes so that unchanged results are not redrawn.
+    """
+
+    fig, ax = plt.subplots(2, 1)
+    ax[0].plot(times, positions)
+    ax[0].set_ylabel('Cart position $\,x(t)$')
+    ax[0].set_xlim([0, 5])
+    ax[0].set_xticklabels([])
+
+    # Set up the figure and axis for angle plot
+    ax[1].plot(times, angles)
+    ax[1].set_ylabel('Pendulum angle $\,\\theta(t)$')
+    ax[1].set_xlabel('Time (sec)')
+    ax[1].set_xlim([0, 5])
+
+    return figure_to_png(fig)
+
+
+@st.cache_data(show_spinner=False)
+def simulate_pendulum(args, state_init, times):
+    """
+    Solve the equation of the PID controlled pendulum; the results are
+    cached so that reruns with the same gains and initial state skip
+    the integration.
+
+    Returns:
+        (np.array, str): states over times, and odeint's message
+    """
+
+    states, infodict = odeint(
+        pendulum_cart_pid, state_init, times, args, full_output=True
+    )
+
+    return states, infodict["message"]
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+@plt.rc_context({'font.size': 7})
+def animate_pendulum(times, positions, angles, t_step):
+    """
+    Animate the cart and the pendulum, and return the animation as
+    HTML; each result takes a few MB, so only recent ones are kept.
+    """
+
+    fig, ax = plt.subplots()
+
+    cart_width = 2
+    cart_height = 1
+    pendulum_length = 7.0
+
+    # Positions of the pendulum bob for all frames
+    pendulum_xs = positions - pendulum_length * np.sin(angles)
+    pendulum_ys = pendulum_length * np.cos(angles)
+
+    # The artists are created once and only their data change over frames
+    cart = ax.add_patch(
+        Rectangle(
+            (-cart_width / 2, -cart_height / 2), cart_width, cart_height,
+            fill=False, edgecolor='k', linewidth=1.5
+        )
+    )
+    rod, = ax.plot([], [], 'r')
+    bob, = ax.plot([], [], 'ro', markersize=10)
+    title = ax.set_title('')
+
+    def init_frame():
+        ax.set_ylim([-10, 10])
+
+        # Set aspect ratio
+        ax.set_aspect('equal')
+        ax.set_yticks([-10, -5, 0, 5, 10])
+        ax.set_yticklabels([])
+
+        return cart, rod, bob, title
+
+    def update_frame(index):
+        # Move the cart
+        cart_x = positions[index]
+        cart_y = 0.0
+        cart.set_x(cart_x - cart_width / 2)
+
+        pendulum_x, pendulum_y = pendulum_xs[index], pendulum_ys[index]
+        rod.set_data([cart_x, pendulum_x], [cart_y, pendulum_y])
+        bob.set_data([pendulum_x], [pendulum_y])
+
+        # Move the view only when the cart leaves the current window
+        k = round(cart_x / 20)
+        if ax.get_xlim()[0] != 20*(k-1):
+            ax.set_xlim([20*(k-1), 20*(k+1)])
+
+        # Set title
+        title.set_text('Time: {:.2f}sec'.format(times[index]))
+
+        return cart, rod, bob, title
+
+    animation = FuncAnimation(
+        fig, update_frame, frames=len(times), init_func=init_frame,
+        interval=2000*t_step, blit=True
+    )
+
+    animation_html = animation.to_jshtml()
+    plt.close(fig)
+
+    return animation_html
+
+
 # Main function
 def sim_pendulum_pid():
     """
@@ -59,8 +216,7 @@ def sim_pendulum_pid():
     b_0 = 1.0 / (m_c * length)
     a_1, a_2, a_3 = b / m_c, -(m_c + m_p) * g * b_0, -b * g * b_0
     # num_open = np.array([b_0, 0.0])
-    den_open = np.array([1.0, a_1, a_2, a_3])
-    open_loop_poles = np.roots(den_open)
+    open_loop_poles = cubic_roots(a_1, a_2, a_3)
 
     # Select the PID gains to achieve the desired char. poly.
     kd0 = (am_10 - a_1) / b_0
@@ -117,8 +273,7 @@ def sim_pendulum_pid():
     am_2 = kp * b_0 + a_2
     am_3 = ki * b_0 + a_3
 
-    char_poly = np.array([1.0, am_1, am_2, am_3])
-    closed_loop_poles = np.roots(char_poly)
+    closed_loop_poles = cubic_roots(am_1, am_2, am_3)
 
     # Print closed-loop poles
     right.write(
@@ -169,9 +324,6 @@ def sim_pendulum_pid():
 
     no_of_iter = round((t_end - t_start) / t_step)
 
-    char_poly = np.array([1.0, am_1, am_2, am_3])
-    closed_loop_poles = np.roots(char_poly)
-
     state_init = np.array([x0, x_dot0, theta0, theta_dot0, eta0])
 
     # t_span = t_start, t_end
@@ -179,10 +331,8 @@ def sim_pendulum_pid():
 
     # Solve the ODE
     try:
-        states, infodict = odeint(
-            pendulum_cart_pid, state_init, times, args, full_output=True
-        )
-        if infodict["message"] != "Integration successful.":
+        states, message = simulate_pendulum(args, state_init, times)
+        if message != "Integration successful.":
             st.error("Numerical problems arise.", icon="🚨")
             return
     except Exception as e:
@@ -193,27 +343,13 @@ def sim_pendulum_pid():
     angles = states[:, 2]
     # controls = -kp * states[:, 2] - ki * states[:, 4] - kd * states[:, 3]
 
-    plt.rcParams.update({'font.size': 7})
-
     st.write(
         """
         * Simulations results: trajectories over time
         """
     )
 
-    fig, ax = plt.subplots(2, 1)
-    ax[0].plot(times, positions)
-    ax[0].set_ylabel('Cart position $\,x(t)$')
-    ax[0].set_xlim([0, 5])
-    ax[0].set_xticklabels([])
-
-    # Set up the figure and axis for angle plot
-    ax[1].plot(times, angles)
-    ax[1].set_ylabel('Pendulum angle $\,\\theta(t)$')
-    ax[1].set_xlabel('Time (sec)')
-    ax[1].set_xlim([0, 5])
-
-    st.pyplot(fig)
+    st.image(plot_trajectories(times, positions, angles))
 
     # Animation
     # plt.rcParams.update({'font.size': 8})
@@ -224,62 +360,10 @@ def sim_pendulum_pid():
         """
     )
 
-    fig, ax = plt.subplots()
-
-    cart_width = 2
-    cart_height = 1
-    pendulum_length = 7.0
-
-    def update_frame(index):
-        ax.clear()
-
-        # Draw the cart
-        cart_x = positions[index]
-        cart_y = 0.0
-
-        cart_bottom_left = (cart_x - cart_width / 2, cart_y - cart_height / 2)
-        cart_bottom_right = (cart_x + cart_width / 2, cart_y - cart_height / 2)
-        cart_top_left = (cart_x - cart_width / 2, cart_y + cart_height / 2)
-        cart_top_right = (cart_x + cart_width / 2, cart_y + cart_height / 2)
-        ax.plot(
-            [cart_bottom_left[0], cart_bottom_right[0]],
-            [cart_bottom_left[1], cart_bottom_right[1]], 'k'
-        )
-        ax.plot(
-            [cart_bottom_left[0], cart_top_left[0]],
-            [cart_bottom_left[1], cart_top_left[1]], 'k'
-        )
-        ax.plot(
-            [cart_bottom_right[0], cart_top_right[0]],
-            [cart_bottom_right[1], cart_top_right[1]], 'k'
-        )
-        ax.plot(
-            [cart_top_left[0], cart_top_right[0]],
-            [cart_top_left[1], cart_top_right[1]], 'k'
-        )
-
-        pendulum_x = cart_x - pendulum_length * np.sin(angles[index])
-        pendulum_y = pendulum_length * np.cos(angles[index])
-        ax.plot([cart_x, pendulum_x], [cart_y, pendulum_y], 'r')
-        ax.plot(pendulum_x, pendulum_y, 'ro', markersize=10)
-
-        k = round(cart_x / 20)
-        ax.set_xlim([20*(k-1), 20*(k+1)])
-        ax.set_ylim([-10, 10])
-
-        # Set aspect ratio
-        ax.set_aspect('equal')
-        ax.set_yticks([-10, -5, 0, 5, 10])
-        ax.set_yticklabels([])
-
-        # Set title
-        ax.set_title('Time: {:.2f}sec'.format(times[index]))
-
-    animation = FuncAnimation(
-        fig, update_frame, frames=len(times), interval=2000*t_step
-    )
     with st.spinner("Preparing animation..."):
-        components.html(animation.to_jshtml(), height=1000)
+        components.html(
+            animate_pendulum(times, positions, angles, t_step), height=1000
+        )
 
     # with st.spinner("Preparing animation..."):
     #     animation.save('files/pendulum.gif', writer=PillowWriter())
@@ -3,6 +3,7 @@ SVD and PCA (by T.-W. Yoon, Feb. 2023)
 """
 
 import numpy as np
+import pandas as pd
 import streamlit as st
 from sklearn.decomposition import PCA
 
@@ -28,17 +29,26 @@ def input_matrix(rows, columns, min_value, max_value):
             size=(rows, columns)
         )
 
-    matrix = np.zeros((rows, columns))
     step = (max_value - min_value) / 10.
 
-    cols = st.columns(columns)
-    for i in range(rows):
-        for j, col in enumerate(cols):
-            matrix[i,j] = col.number_input(
-                f"({i+1},{j+1})-th element in [{min_value}, {max_value}]",
-                value=st.session_state.initial_matrix[i,j],
-                min_value=min_value, max_value=max_value, step=step
-            )
+    # A single data editor is used for all the entries
+    st.write(f"Each element should be in [{min_value}, {max_value}].")
+    initial_df = pd.DataFrame(
+        st.session_state.initial_matrix,
+        index=[f"{i+1}" for i in range(rows)],
+        columns=[f"{j+1}" for j in range(columns)]
+    )
+    edited_df = st.data_editor(
+        initial_df,
+        num_rows="fixed",
+        column_config={
+            column: st.column_config.NumberColumn(
+                min_value=min_value, max_value=max_value, step=step,
+                format="%.2f", required=True
+            ) for column in initial_df.columns
+        }
+    )
+    matrix = edited_df.to_numpy(dtype=float)
 
     return matrix
 
@@ -186,7 +196,7 @@ def svd_pca():
     )
     
     a_mean = a_matrix.mean(axis=0)
-    # a_0 = np.tile(a_mean, (rows, 1)) # This is only for printing
+    # a_0 = np.broadcast_to(a_mean, (rows, columns)) # This is only for printing
     a_delta = a_matrix - a_mean
 
     # SVD of A matrix
@@ -208,24 +218,29 @@ def svd_pca():
     s_PCA = pca.singular_values_
     vt_PCA = pca.components_
 
-    methods = ("svd", "pca", "PCA")
+    # Singular values, right singular vectors, reduced and approximated
+    # matrices of each method
+    results = {
+        "svd": (s_svd, vt_svd, a_reduced_svd, a_rec_svd),
+        "pca": (s_pca, vt_pca, a_reduced_pca, a_rec_pca),
+        "PCA": (s_PCA, vt_PCA, a_reduced_PCA, a_rec_PCA),
+    }
     cols = st.columns(3)
 
     st.write("")
-    for (col, method) in zip(cols, methods):
+    for (col, (method, result)) in zip(cols, results.items()):
+        s_values, vt_matrix, a_reduced, a_rec = result
         col.write(f"**$~~~ ${method}**")
         col.write("Singular values")
-        col.write(eval("s_" + method).reshape(1, -1))
+        col.write(s_values.reshape(1, -1))
         col.write("Right singular vectors $\,v_k$'s")
-        col.write(eval("vt_" + method).T)
+        col.write(vt_matrix.T)
         col.write("Reduced matrix $\,A v_k$'s")
-        col.write(eval("a_reduced_" + method))
+        col.write(a_reduced)
         col.write("Approxmated matrix")
-        col.write(eval("a_rec_" + method))
+        col.write(a_rec)
         col.write(
-            "Approx. error: $~${:.2e}".format(
-                np.linalg.norm(a_matrix - eval("a_rec_" + method))
-            )
+            "Approx. error: $~${:.2e}".format(np.linalg.norm(a_matrix - a_rec))
         )
 
     left, right = st.columns(2)
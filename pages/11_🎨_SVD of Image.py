@@ -7,65 +7,114 @@ import numpy as np
 import streamlit as st
 
 
-def svd_image(input_image, output_rank, new_image=True):
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_image(image_bytes):
     """
-    This function performs the SVD of an image, and compresses it.
+    This function reads an uploaded image file, and resizes it before the
+    SVD if its width or height is greater than 1024 pixels.
 
-    :param input_image: 2 or 3 dimensional image matrix
-    :param output_rank: rank of the compressed image
-    :param new_image:   True  => computing the SVD of the image
-                        False => reusing the SVD previously computed
-    :return:            2 or 3 dimensional compressed image matrix
+    :param image_bytes: contents of the uploaded image file
+    :return:            2 or 3 dimensional image matrix
+    """
+
+    from io import BytesIO
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_bytes))
+
+    if max(image.width, image.height) > 1024:
+        if image.width > image.height:
+            new_width, new_height = 1024, image.height * 1024 // image.width
+        else:
+            new_width, new_height = image.width * 1024 // image.height, 1024
+
+        # JPEG files are decoded directly at a reduced scale (no smaller
+        # than the new size), so that the full resolution is never loaded
+        image.draft(image.mode, (new_width, new_height))
+        image = image.resize((new_width, new_height))
+
+    return np.array(image)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def image_svd(image_bytes):
     """
+    This function performs the SVD of an uploaded image. The results are
+    cached on the file contents, so that the same image is decomposed
+    only once.
 
-    from skimage.util import img_as_float, img_as_ubyte
+    :param image_bytes: contents of the uploaded image file
+    :return:            (us, vt, rank), where us is u scaled by the singular
+                        values; us and vt are (C, H, k) and (C, k, W)
+    """
 
-    input_image = img_as_float(input_image)
-    image_shape = input_image.shape
+    from skimage.util import img_as_float32
 
-    if len(image_shape) == 2:  # 2-dimensional grayscale images are reshaped to be
-        image_shape = (*image_shape, 1)  # 3-dimensional images with a single color
-        input_image = input_image.reshape(*image_shape)
+    input_image = img_as_float32(load_image(image_bytes))  # single precision is enough for images
 
-    output_image = np.zeros(image_shape)
-    rows, columns, channels = image_shape
+    if input_image.ndim == 2:  # 2-dimensional grayscale images are reshaped to be
+        input_image = input_image[:, :, np.newaxis]  # images with a single color
 
-    if new_image is True:  # Compute SVD for a new image
-        ns = min(rows, columns)  # Upper bound on the rank of input image
+    # Channels are stacked along the leading axis, so that a single call
+    # decomposes all of them
+    u, s, vt = np.linalg.svd(np.moveaxis(input_image, 2, 0), full_matrices=False)
 
-        st.session_state.u = np.zeros((rows, ns, channels))
-        st.session_state.vt = np.zeros((ns, columns, channels))
-        st.session_state.s = np.zeros((ns, channels))
+    # The rank of each channel is read off from its singular values
+    # with the same tolerance as np.linalg.matrix_rank()
+    tol = s.max(axis=1, keepdims=True) * max(input_image.shape[:2]) * np.finfo(s.dtype).eps
+    rank = max(1, int((s > tol).sum(axis=1).max()))
 
-        for i in range(channels):  # SVD of each channel
-            st.session_state.u[:,:,i], st.session_state.s[:,i], st.session_state.vt[:,:,i] \
-              = np.linalg.svd(input_image[:,:,i], full_matrices=False)
+    return u * s[:,np.newaxis,:], vt, rank
 
-    for i in range(channels):  # Compress the image using SVD
-        output_image[:,:,i] = (
-            st.session_state.u[:,:output_rank,i] * st.session_state.s[:output_rank,i]
-        ) @ st.session_state.vt[:output_rank,:,i]
 
-        if channels == 1:  # grayscale images are reshaped back to be 2-dimensional images
-            output_image = output_image.reshape(rows, columns)
+def svd_image(image_bytes, output_rank):
+    """
+    This function compresses an image using its SVD.
+
+    :param image_bytes: contents of the uploaded image file
+    :param output_rank: rank of the compressed image
+    :return:            2 or 3 dimensional compressed image matrix
+    """
+
+    from skimage.util import img_as_ubyte
+
+    us, vt, _ = image_svd(image_bytes)
+
+    # Compress the image using SVD; the reconstruction of the previous rank
+    # is kept, and only the rank-one terms in between are added or subtracted
+    if st.session_state.get("recon_image") is None:
+        st.session_state.recon_image = np.zeros((us.shape[0], us.shape[1], vt.shape[2]), us.dtype)
+        st.session_state.recon_rank = 0
+    pre_rank = st.session_state.recon_rank
+
+    if output_rank >= pre_rank:
+        st.session_state.recon_image += us[:,:,pre_rank:output_rank] @ vt[:,pre_rank:output_rank,:]
+    elif pre_rank - output_rank < output_rank:
+        st.session_state.recon_image -= us[:,:,output_rank:pre_rank] @ vt[:,output_rank:pre_rank,:]
+    else:
+        st.session_state.recon_image = us[:,:,:output_rank] @ vt[:,:output_rank,:]
+    st.session_state.recon_rank = output_rank
+
+    output_image = np.moveaxis(st.session_state.recon_image, 0, 2)  # channels back to the last axis
+
+    if output_image.shape[2] == 1:  # grayscale images are reshaped back to be 2-dimensional images
+        output_image = output_image[:,:,0]
 
     return img_as_ubyte(np.clip(output_image, 0, 1))
 
 
 def reset_new_image():
-    st.session_state.new_image = True
+    st.session_state.pre_output_rank = 1
+    st.session_state.recon_image = None
 
 
-def svd_plot(output_rank):
+def svd_plot(image_bytes, original_image, rank, output_rank):
     """
     This function calls svd_image() and plot the results.
     """
 
     with st.spinner("Performing SVD"):
-        output_image = svd_image(
-            st.session_state.input_image, output_rank, st.session_state.new_image
-        )                           # Compress the image by SVD
-        st.session_state.new_image = False
+        output_image = svd_image(image_bytes, output_rank)  # Compress the image by SVD
 
         # Plot the resulting image
 
@@ -76,8 +125,8 @@ def svd_plot(output_rank):
             use_column_width=True
         )
         right.image(
-            image=st.session_state.input_image,
-            caption=f"Original rank-{st.session_state.rank} image",
+            image=original_image,
+            caption=f"Original rank-{rank} image",
             use_column_width=True
         )
 
@@ -89,13 +138,12 @@ def reset_initial_rank():
 def run_svd_image():
     """
     This function selects an image file and computes its rank.
-    The resulting image and rank value are stored
-    as streamlit session state variables.
+    The image and its SVD are cached on the file contents.
     
     This is the main function calling svd_plot().
     """
 
-    from PIL import Image, UnidentifiedImageError
+    from PIL import UnidentifiedImageError
 
     st.write("## 🎨 Image Compression by SVD")
 
@@ -122,48 +170,22 @@ def run_svd_image():
     )
 
     if image_file is not None:
-        if st.session_state.new_image:
-            # Process the uploaded image file
-            try:
-                image = Image.open(image_file)
-            except UnidentifiedImageError as e:
-                st.error(f"An error occurred: {e}", icon="🚨")
-                return None
-
-            st.session_state.pre_output_rank = 1
-
-            if max(image.width, image.height) > 1024:
-                if image.width > image.height:
-                    new_width, new_height = 1024, image.height * 1024 // image.width
-                else:
-                    new_width, new_height = image.width * 1024 // image.height, 1024
-
-                image = image.resize((new_width, new_height))
-
-            original_image = np.array(image)
-            image_shape = original_image.shape
-
-            # If the image is grayscale, channels = 1
-            channels = 1 if len(image_shape) == 2 else 3
-
-            rank = 1
-            with st.spinner("Computing the rank of the uploaded image"):
-                for i in range(channels):  # Compute the rank of each channel
-                    if channels == 1:
-                        rank = np.linalg.matrix_rank(original_image)
-                    else:
-                        rank = max(rank, np.linalg.matrix_rank(original_image[:, :, i]))
-
-            # Store the image together with the rank and dimension
-            st.session_state.input_image = original_image
-            st.session_state.image_dim = image.size
-            st.session_state.rank = rank
+        image_bytes = image_file.getvalue()
+
+        # Process the uploaded image file
+        try:
+            with st.spinner("Computing the SVD of the uploaded image"):
+                original_image = load_image(image_bytes)
+                _, _, rank = image_svd(image_bytes)
+        except UnidentifiedImageError as e:
+            st.error(f"An error occurred: {e}", icon="🚨")
+            return None
 
         # Write the information of the uploaded image
         st.write(
             "Uploaded (resized) image:",
-            st.session_state.image_dim[0], "x", st.session_state.image_dim[1],
-            "pixels of rank", st.session_state.rank,            
+            original_image.shape[1], "x", original_image.shape[0],
+            "pixels of rank", rank,
         )
         st.write("---")
 
@@ -180,14 +202,14 @@ def run_svd_image():
         st.session_state.output_rank = input_method(
             label="$\\hspace{0.07em}\\texttt{Rank of the compressed image}$",
             min_value=1,
-            max_value=int(st.session_state.rank),
+            max_value=rank,
             value=st.session_state.pre_output_rank,
             step=1,
             label_visibility="visible"
         )
 
         # Compress the image by SVD
-        svd_plot(st.session_state.output_rank)
+        svd_plot(image_bytes, original_image, rank, st.session_state.output_rank)
 
     return None
 
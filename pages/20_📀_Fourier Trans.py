@@ -6,27 +6,31 @@ import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FormatStrFormatter
+from scipy.fft import rfft
 # from pydub import AudioSegment
 import soundfile as sf
 from audio_recorder_streamlit import audio_recorder
 from io import BytesIO
 
 
+@st.cache_data(show_spinner=False)
 def note_sound(freq=391.9954, sample_rate=44100, seconds=2):
     """
-    Generate a sine wave
+    Generate a sine wave, or the sum of sine waves for a chord
 
     Args:
-        freq (float): frequency of the generated wave. Defaults to 'G'.
+        freq (float or list): frequency (or frequencies) of the generated
+            wave. Defaults to 'G'.
         sample_rate (float): sampling frequency. Defaults to 44100.
         seconds (int, optional): duration. Defaults to 2.
 
     Returns:
-        np.array: generated sine wave.
+        np.array: generated sine wave, cached over reruns.
     """
 
     tspan = np.linspace(0, seconds, seconds * sample_rate, False)
-    return np.sin(2 * np.pi * freq * tspan)
+    freqs = np.atleast_1d(freq)[:, np.newaxis]
+    return np.sin(2 * np.pi * freqs * tspan).sum(axis=0)
 
 
 def do_fft(time_func, sample_rate=44100, max_freq=1000, time_plot=False, max_time=None):
@@ -44,8 +48,10 @@ def do_fft(time_func, sample_rate=44100, max_freq=1000, time_plot=False, max_tim
     plt.rcParams.update({'font.size': 6})
     time_len = len(time_func)
 
-    # Perform FFT
-    fourier = np.fft.fft(time_func / time_len)
+    # Perform FFT; time_func is real, so only the nonnegative frequencies
+    # are computed, and the results are divided by time_len. Single
+    # precision is enough for plotting the magnitude spectrum.
+    fourier = rfft(np.asarray(time_func, dtype=np.float32), norm="forward", workers=-1)
     mag_spectrum = np.abs(fourier)
 
     # Plot the results
@@ -71,7 +77,7 @@ def do_fft(time_func, sample_rate=44100, max_freq=1000, time_plot=False, max_tim
     # There is no point of having max_freq greater than 0.5*sample_rate
     max_freq = min(max_freq, sample_rate / 2)
 
-    freq_len = int(len(mag_spectrum) * max_freq / sample_rate)
+    freq_len = int(time_len * max_freq / sample_rate)
     frequency = np.linspace(0, max_freq, freq_len)
 
     ax.plot(frequency, mag_spectrum[:freq_len], color='#ff7f00')
@@ -186,7 +192,7 @@ def fourier_transform():
     # Choose the note to consider
     st.write("##### Select a note")
     note = st.radio(
-        label="$\\hspace{0.12em}\\texttt{Select a note}$",
+        label="Select a note",
         options=('C', 'D', 'E', 'F', 'G', 'A', 'B', 'C+E+G', 'C+F+A'),
         horizontal=True,
         index=4,
@@ -196,12 +202,9 @@ def fourier_transform():
     # Compose a function with the selected note
     sample_rate = 44_100  # 44100 samples per second
 
-    if len(note) == 1:
-        time_func = note_sound(freq=note_freq[note], seconds=2)
-    else:
-        time_func = note_sound(freq=note_freq[note[0]], seconds=2) \
-                  + note_sound(freq=note_freq[note[2]], seconds=2) \
-                  + note_sound(freq=note_freq[note[4]], seconds=2)
+    time_func = note_sound(
+        freq=[note_freq[name] for name in note.split('+')], seconds=2
+    )
 
     # Play the sound
     st.audio(time_func[:len(time_func)//2], sample_rate=sample_rate)
@@ -212,18 +215,18 @@ def fourier_transform():
     st.write("---")
     st.write("##### Select a sound wave")
     sound_source = st.radio(
-        label="$\\hspace{0.12em}\\texttt{Select a sound wave}$",
+        label="Select a sound wave",
         options=("Sample file", "Your file", "Your voice"),
         # horizontal=True,
         label_visibility="collapsed"
     )
 
     if sound_source == "Sample file":
-        signal, sr = sf.read("files/example.wav")
+        signal, sr = sf.read("files/example.wav", dtype="float32")
     else:
         if sound_source == "Your file":
             audio_file = st.file_uploader(
-                label="$\\hspace{0.12em}\\texttt{Upload an audio file}$",
+                label="Upload an audio file",
                 # type=["wav", "mp3", "ogg", "aac", "wma", "m4a", "flac"],
                 type=["wav", "mp3", "ogg", "flac"],
                 label_visibility="collapsed"
@@ -247,14 +250,14 @@ def fourier_transform():
                 return None
         try:
             # signal, sr = get_audio_data(audio_file)
-            signal, sr = sf.read(audio_file)
+            signal, sr = sf.read(audio_file, dtype="float32")
         except Exception as e:
             st.error(f"An error occurred: {e}", icon="🚨")
             return None
 
     if signal.any():
-        if len(signal.shape) == 2:
-            signal = signal.mean(axis=1)
+        if len(signal.shape) == 2:  # stereo signals are averaged in single precision
+            signal = signal.mean(axis=1, dtype=np.float32)
         st.audio(signal, sample_rate=sr)
         show_results(signal, sr)
 
@@ -4,29 +4,51 @@ Simulating the Monty Hall Problem (by T.-W. Yoon, Oct. 2023)
 
 import streamlit as st
 from streamlit_image_select import image_select
+import numpy as np
 import random
+import base64
 
 # Door indices
 doors = [0, 1, 2]
 
+# Door states: closed, opened with the car, opened with a goat, and
+# selected by the user, which index the door images
+CLOSED, CAR, GOAT, SELECTED = range(4)
+
 # Door images
-door_images = {
-    "closed": "files/closed_door.png",
-    "car": "files/car_door.png",
-    "goat": "files/goat_door.png",
-    "selected": "files/selected_door.png"
-}
+door_images = (
+    "files/closed_door.png",
+    "files/car_door.png",
+    "files/goat_door.png",
+    "files/selected_door.png"
+)
 
 door_captions = ["Door 1", "Door 2", "Door 3"]
 
-doors_closed = [
-    door_images["closed"], door_images["closed"], door_images["closed"]
-]
+doors_closed = (CLOSED, CLOSED, CLOSED)
 
 positive_message = "Congratulations! You won the car!"
 negative_message = "Sorry, you didn't win the car."
 
 
+@st.cache_resource(show_spinner=False)
+def door_image_urls():
+    """
+    This function reads the door images once per server process, and
+    returns them as base64 data URLs indexed by the door states. The URLs
+    are passed to image_select() as they are, without file reading or
+    encoding on every rerun.
+    """
+
+    urls = []
+    for path in door_images:
+        with open(path, "rb") as image_file:
+            encoded = base64.b64encode(image_file.read()).decode()
+        urls.append(f"data:image/png;base64,{encoded}")
+
+    return urls
+
+
 def choose_door():
     """
     This function randomly places the car behind a door, and
@@ -41,19 +63,22 @@ def choose_door():
     st.session_state.selected: door chosen by the user.
     """
 
-    car = random.choice(doors)  # Place the car at a random position
+    selected = st.session_state.selected
+    car = random.randrange(3)  # Place the car at a random position
 
-    # Host reveals a goat door
-    goat_doors = [
-      door for door in doors if door != st.session_state.selected and door != car
-    ]
-    shown = goat_doors[0] if len(goat_doors) == 1 else random.choice(goat_doors)
-    not_shown = list(set(doors) - {st.session_state.selected, shown})[0]
+    # Host reveals a goat door; the door indices 0, 1, 2 add up to 3, so
+    # the third door of any two is 3 minus their sum
+    if selected == car:  # Either of the other two doors
+        shown = (car + 1 + random.randrange(2)) % 3
+    else:
+        shown = 3 - selected - car
+    not_shown = 3 - selected - shown
 
     # Set the door images
-    st.session_state.doors[st.session_state.selected] = door_images["selected"]
-    st.session_state.doors[shown] = door_images["goat"]
-    st.session_state.doors[not_shown] = door_images["closed"]
+    door_states = st.session_state.doors
+    door_states[selected] = SELECTED
+    door_states[shown] = GOAT
+    door_states[not_shown] = CLOSED
 
     # Save three door states to session_state variables
     st.session_state.car = car
@@ -77,15 +102,18 @@ def keep_choice():
     """
 
     if st.session_state.button_enabled:
-        if st.session_state.selected == st.session_state.car:
+        selected, not_shown = st.session_state.selected, st.session_state.not_shown
+        door_states = st.session_state.doors
+
+        if selected == st.session_state.car:
             st.session_state.message = positive_message
-            st.session_state.doors[st.session_state.selected] = door_images["car"]
-            st.session_state.doors[st.session_state.not_shown] = door_images["goat"]
+            door_states[selected] = CAR
+            door_states[not_shown] = GOAT
             st.session_state.wins += 1
         else:
             st.session_state.message = negative_message
-            st.session_state.doors[st.session_state.selected] = door_images["goat"]
-            st.session_state.doors[st.session_state.not_shown] = door_images["car"]
+            door_states[selected] = GOAT
+            door_states[not_shown] = CAR
             st.session_state.losses += 1
         st.session_state.button_enabled = False
 
@@ -103,15 +131,18 @@ def switch_choice():
     """
 
     if st.session_state.button_enabled:
-        if st.session_state.not_shown == st.session_state.car:
+        selected, not_shown = st.session_state.selected, st.session_state.not_shown
+        door_states = st.session_state.doors
+
+        if not_shown == st.session_state.car:
             st.session_state.message = positive_message
-            st.session_state.doors[st.session_state.selected] = door_images["goat"]
-            st.session_state.doors[st.session_state.not_shown] = door_images["car"]
+            door_states[selected] = GOAT
+            door_states[not_shown] = CAR
             st.session_state.wins += 1
         else:
             st.session_state.message = negative_message
-            st.session_state.doors[st.session_state.selected] = door_images["car"]
-            st.session_state.doors[st.session_state.not_shown] = door_images["goat"]
+            door_states[selected] = CAR
+            door_states[not_shown] = GOAT
             st.session_state.losses += 1
         st.session_state.button_enabled = False
 
@@ -129,93 +160,66 @@ def reset_game():
     This function sets the necessary flags to reset the game
     for initialization.
     """
-    st.session_state.doors = doors_closed[:]
+    st.session_state.doors = list(doors_closed)
     st.session_state.wins = 0
     st.session_state.losses = 0
     st.session_state.new_game = True
     st.session_state.button_enabled = True
 
 
-def auto_game_keep():
+@st.cache_resource(show_spinner=False)
+def random_generator():
     """
-    This function plays the game automatically with random choices
-    and the 'keep' policy. The number of games to play is stored
-    as st.session_state.no_of_games.
+    This function returns the random number generator for automatic
+    play, which is created once per server process and shared by the
+    sessions; its bit generator is guarded by a lock.
     """
-    for _ in range(st.session_state.no_of_games):
-        st.session_state.selected = random.choice(doors)
-        choose_door()
-        keep_choice()
-        st.session_state.button_enabled = True
+    return np.random.default_rng()
 
 
-def auto_game_switch():
+def auto_game_hits():
     """
-    This function plays the game automatically with random choices
-    and the 'switch' policy. The number of games to play is stored
-    as st.session_state.no_of_games.
-    """
-    for _ in range(st.session_state.no_of_games):
-        st.session_state.selected = random.choice(doors)
-        choose_door()
-        switch_choice()
-        st.session_state.button_enabled = True
-
-
-def monty_hall():
-    """
-    This function implements a simulation of the Monty Hall Problem.
-    It provides a user interface for the user to manually or
-    automatically play the game. For manual play, the user selects
-    a door and has the option to keep or switch their choice.
-    For automatic play, the function allows the user to define
-    the number of games to play and provides buttons to randomly
-    choose a door and keep or switch the choice. The function also
-    keeps track of wins and losses and displays the win percentage.
+    This function draws the user's choices and the car positions for
+    all the games at once, and returns how many times they coincide.
+    The number of games to play is stored as st.session_state.no_of_games.
     """
+    rng = random_generator()
+    no_of_games = st.session_state.no_of_games
 
-    st.write("## 🚕 Monty Hall Problem")
+    selected = rng.integers(len(doors), size=no_of_games)
+    cars = rng.integers(len(doors), size=no_of_games)
 
-    st.write("")
-    st.write(
-        """
-        Behind three doors are two goats and a car.
-        Let's see if you win the car!
+    return int(np.count_nonzero(selected == cars))
 
-        Choose one door and press the :blue[Choose] button below. We will then
-        open another door to reveal a goat. After that, you can decide whether
-        to keep your original choice or switch to the remaining door in order
-        to have a chance of winning the car. You can continue playing the game
-        or play it automatically.
-        """
-    )
 
-    if "doors" not in st.session_state:
-        st.session_state.doors = doors_closed[:]
-
-    if "wins" not in st.session_state:
-        st.session_state.wins = 0
-
-    if "losses" not in st.session_state:
-        st.session_state.losses = 0
+def auto_game_keep():
+    """
+    This function plays the game automatically with random choices
+    and the 'keep' policy, which wins when the first choice hides the car.
+    """
+    wins = auto_game_hits()
+    st.session_state.wins += wins
+    st.session_state.losses += st.session_state.no_of_games - wins
 
-    if "message" not in st.session_state:
-        st.session_state.message = ""
 
-    if "new_game" not in st.session_state:
-        st.session_state.new_game = True
+def auto_game_switch():
+    """
+    This function plays the game automatically with random choices
+    and the 'switch' policy, which wins when the first choice hides a goat.
+    """
+    losses = auto_game_hits()
+    st.session_state.wins += st.session_state.no_of_games - losses
+    st.session_state.losses += losses
 
-    if "button_enabled" not in st.session_state:
-        st.session_state.button_enabled = True
 
-    st.write("**Play options**")
-    play_option = st.radio(
-        label="Play Options",
-        options=("Manual play", "Automatic play"),
-        horizontal=True,
-        label_visibility="collapsed"
-    )
-    st.write("")
+@st.fragment
+def play_game(play_option):
+    """
+    This function shows the doors and the buttons of the selected play
+    option, together with the statistics. As a fragment, it is rerun
+    alone when one of its buttons is pressed, while the description
+    and the play options above are kept.
+    """
 
     if play_option == "Manual play":
         c1, c2, c3, c4 = st.columns(4)
@@ -223,7 +227,7 @@ def monty_hall():
             # Show the three closed doors
             st.session_state.selected = image_select(
                 label="",
-                images=doors_closed,
+                images=[door_image_urls()[state] for state in doors_closed],
                 use_container_width=False,
                 captions=door_captions,
                 return_value="index"
@@ -235,7 +239,7 @@ def monty_hall():
             # Show the selected, opened, and closed doors
             image_select(
                 label="",
-                images=st.session_state.doors,
+                images=[door_image_urls()[state] for state in st.session_state.doors],
                 use_container_width=False,
                 captions=door_captions,
                 return_value="index"
@@ -283,5 +287,57 @@ def monty_hall():
         )
 
 
+
+def monty_hall():
+    """
+    This function implements a simulation of the Monty Hall Problem.
+    It provides a user interface for the user to manually or
+    automatically play the game. For manual play, the user selects
+    a door and has the option to keep or switch their choice.
+    For automatic play, the function allows the user to define
+    the number of games to play and provides buttons to randomly
+    choose a door and keep or switch the choice. The function also
+    keeps track of wins and losses and displays the win percentage.
+    """
+
+    st.write("## 🚕 Monty Hall Problem")
+
+    st.write("")
+    st.write(
+        """
+        Behind three doors are two goats and a car.
+        Let's see if you win the car!
+
+        Choose one door and press the :blue[Choose] button below. We will then
+        open another door to reveal a goat. After that, you can decide whether
+        to keep your original choice or switch to the remaining door in order
+        to have a chance of winning the car. You can continue playing the game
+        or play it automatically.
+        """
+    )
+
+    # Initialize the game state once per session
+    if "doors" not in st.session_state:
+        st.session_state.update(
+            doors=list(doors_closed),
+            wins=0,
+            losses=0,
+            message="",
+            new_game=True,
+            button_enabled=True
+        )
+
+    st.write("**Play options**")
+    play_option = st.radio(
+        label="Play Options",
+        options=("Manual play", "Automatic play"),
+        horizontal=True,
+        label_visibility="collapsed"
+    )
+    st.write("")
+
+    play_game(play_option)
+
+
 if __name__ == "__main__":
     monty_hall()
@@ -4,10 +4,12 @@ Classification algorithms (by T.-W. Yoon, Mar. 2023)
 
 import streamlit as st
 import numpy as np
+import pandas as pd
 
 import matplotlib.pyplot as plt
 from sklearn import datasets
 from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
 
 from sklearn.decomposition import PCA
 from sklearn.svm import SVC
@@ -19,6 +21,7 @@ import torch.nn as nn
 import torch.optim as optim
 
 
+@st.cache_data(show_spinner=False)
 def get_dataset(name):
     if name == 'Iris':
         data = datasets.load_iris()
@@ -31,6 +34,54 @@ def get_dataset(name):
     return X, y
 
 
+@st.cache_data(show_spinner=False)
+def split_dataset(name, test_size=0.2, random_state=1234):
+    """
+    Split the dataset into training and test data, and standardize the
+    features with the mean and variance of the training data; the results
+    are cached for each dataset.
+    """
+
+    X, y = get_dataset(name)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+
+    scaler = StandardScaler().fit(X_train)
+    return scaler.transform(X_train), scaler.transform(X_test), y_train, y_test
+
+
+@st.cache_resource(show_spinner=False)
+def fit_classifier(clf_name, dataset_name, **params):
+    """
+    Fit an SVM, K-Nearest Neighbors or Random Forest classifier to the
+    training data. The fitted classifiers are cached and shared across
+    reruns for each choice of the dataset and the tuning parameters.
+    """
+
+    if clf_name == 'Support Vector Machine':
+        clf = SVC(**params)
+    elif clf_name == 'K-Nearest Neighbors':
+        clf = KNeighborsClassifier(**params)
+    else:
+        clf = RandomForestClassifier(**params, random_state=1234, n_jobs=-1)
+
+    X_train, _, y_train, _ = split_dataset(dataset_name)
+    clf.fit(X_train, y_train)
+
+    return clf
+
+
+@st.cache_data(show_spinner=False)
+def project_test_data(dataset_name):
+    """
+    Project the test data onto the 2 primary principal components.
+    """
+
+    _, X_test, _, _ = split_dataset(dataset_name)
+    return PCA(2).fit_transform(X_test)
+
+
 class LogisticRegression(nn.Module):
     def __init__(self, input_size, num_classes):
         super(LogisticRegression, self).__init__()
@@ -44,19 +95,68 @@ class LogisticRegression(nn.Module):
 class NeuralNetwork(nn.Module):
     def __init__(self, input_size, hidden_sizes, num_classes):
         super(NeuralNetwork, self).__init__()
-        self.hidden_layers = nn.ModuleList()
-        self.hidden_layers.append(nn.Linear(input_size, hidden_sizes[0]))
-        for i in range(1, len(hidden_sizes)):
-            self.hidden_layers.append(nn.Linear(hidden_sizes[i-1], hidden_sizes[i]))
-        self.output_layer = nn.Linear(hidden_sizes[-1], num_classes)
+        layers = []
+        for in_size, out_size in zip([input_size] + hidden_sizes, hidden_sizes):
+            layers += [nn.Linear(in_size, out_size), nn.ReLU(inplace=True)]
+        layers.append(nn.Linear(hidden_sizes[-1], num_classes))
+        self.layers = nn.Sequential(*layers)
 
     def forward(self, x):
-        for layer in self.hidden_layers:
-            x = torch.relu(layer(x))
-        out = self.output_layer(x)
+        out = self.layers(x)
         return out
 
 
+@st.cache_data(show_spinner=False)
+def train_model(dataset_name, learning_rate, num_epochs, hidden_layer_sizes=None):
+    """
+    Train a logistic regression model, or a neural network if the sizes of
+    its hidden layers are given, by SGD. The losses, the predicted classes
+    of the test data and the accuracy are cached for each choice of
+    the dataset and the tuning parameters.
+    """
+
+    X, y = get_dataset(dataset_name)
+    num_classes = np.unique(y).size
+    num_features = X.shape[1]
+
+    X_train, X_test, y_train, y_test = split_dataset(dataset_name)
+
+    if hidden_layer_sizes:
+        model = NeuralNetwork(num_features, hidden_layer_sizes, num_classes)
+    else:
+        model = LogisticRegression(num_features, num_classes)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.SGD(model.parameters(), lr=learning_rate)
+
+    # Convert inputs to PyTorch tensors
+    inputs = torch.from_numpy(X_train).float()
+    targets = torch.from_numpy(y_train).long()
+
+    losses = []
+    for epoch in range(num_epochs):
+        # Forward pass
+        outputs = model(inputs)
+        loss = criterion(outputs, targets)
+
+        # Backward pass and optimize
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+
+        # Save loss for plotting
+        losses.append(loss.item())
+
+    with torch.no_grad():
+        inputs = torch.from_numpy(X_test).float()
+        targets = torch.from_numpy(y_test).long()
+        outputs = model(inputs)
+        _, predicted = torch.max(outputs.data, 1)
+        accuracy = (predicted == targets).double().mean().item()
+
+    return losses, predicted.numpy(), accuracy
+
+
 def classifier():
     st.write("## 🔍 Classification Algorithms")
 
@@ -101,16 +201,14 @@ def classifier():
 
     X, y = get_dataset(dataset_name)
 
-    num_classes = len(set(y))
+    num_classes = np.unique(y).size
     num_samples, num_features = X.shape
     st.write('- Number of features:', num_features)
     st.write('- Number of classes:', num_classes)
     st.write('- Number of samples:', num_samples)
 
     #### CLASSIFICATION ####
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=1234
-    )
+    X_train, X_test, y_train, y_test = split_dataset(dataset_name)
 
     clf_name = st.sidebar.radio(
         '$\\texttt{Select classifier}$',
@@ -125,96 +223,60 @@ def classifier():
     _, right = st.columns([1, 30])
     _, r1, _, r2 = st.columns([1, 13, 1, 13])
 
-    if "hidden_layer_sizes" not in st.session_state:
-        st.session_state.hidden_layer_sizes = 1
-
     if clf_name in {'Logistic Regression', 'Neural Network'}:
         learning_rate = r1.slider(
             "Learning rate", 0.001, 0.1, step=0.001, format="%.3f"
         )
         if clf_name == 'Neural Network':
             num_epochs = r1.slider("Number of epochs", 50, 500)
-            if st.session_state.hidden_layer_sizes == 1:
-                num_hidden_layers = r2.slider(
-                    'Number of hidden layers', 1, 10, 1, 1,
-                    key='hidden_layer_sizes'
-                )
-            else:
-                num_hidden_layers = r1.slider(
-                    'Number of hidden layers', 1, 10, 1, 1,
-                    key='hidden_layer_sizes'
-                )
-
-            hidden_layer_sizes = []
-            for i in range(num_hidden_layers):
-                if i < num_hidden_layers//2 - 1:
-                    size = r1.slider(
-                        f'Number of units in hidden layer {i+1}', 1, 100, 10, 1
-                    )
-                else:
-                    size = r2.slider(
-                        f'Number of units in hidden layer {i+1}', 1, 100, 10, 1
+            num_hidden_layers = r1.slider('Number of hidden layers', 1, 10, 1, 1)
+
+            # The numbers of units are edited in a single table with a row
+            # for each hidden layer
+            units_df = pd.DataFrame(
+                {"Units": [10] * num_hidden_layers},
+                index=[f"Hidden layer {i+1}" for i in range(num_hidden_layers)]
+            )
+            edited_df = r2.data_editor(
+                units_df,
+                num_rows="fixed",
+                column_config={
+                    "Units": st.column_config.NumberColumn(
+                        "Number of units", min_value=1, max_value=100, step=1,
+                        required=True
                     )
-                hidden_layer_sizes.append(size)
+                }
+            )
+            hidden_layer_sizes = edited_df["Units"].astype(int).tolist()
 
-            model = NeuralNetwork(num_features, hidden_layer_sizes, num_classes)
         else:
             num_epochs = r2.slider("Number of epochs", 50, 500)
-            model = LogisticRegression(num_features, num_classes)
-
-        criterion = nn.CrossEntropyLoss()
-        optimizer = optim.SGD(model.parameters(), lr=learning_rate)
-
-        losses = []
-        for epoch in range(num_epochs):
-            # Convert inputs to PyTorch tensors
-            inputs = torch.from_numpy(X_train).float()
-            targets = torch.from_numpy(y_train).long()
-
-            # Forward pass
-            outputs = model(inputs)
-            loss = criterion(outputs, targets)
-
-            # Backward pass and optimize
-            optimizer.zero_grad()
-            loss.backward()
-            optimizer.step()
+            hidden_layer_sizes = None
 
-            # Save loss for plotting
-            losses.append(loss.item())
-
-        with torch.no_grad():
-            inputs = torch.from_numpy(X_test).float()
-            targets = torch.from_numpy(y_test).long()
-            outputs = model(inputs)
-            _, predicted = torch.max(outputs.data, 1)
-            accuracy = (predicted == targets).sum().item() / targets.size(0)
+        losses, predicted, accuracy = train_model(
+            dataset_name, learning_rate, num_epochs, hidden_layer_sizes
+        )
 
         st.write("- Loss versus epoch")
-        fig1 = plt.figure()
-        plt.plot(losses)
-        plt.xlabel("Epoch")
-        plt.ylabel("Loss")
-
-        st.pyplot(fig1)
+        st.line_chart(
+            pd.DataFrame({"Loss": losses}), x_label="Epoch", y_label="Loss"
+        )
 
     else:  # SVM, K-Nearest Neighbors, or Random Forest
         if clf_name == 'Support Vector Machine':
             c_value = right.slider('C', 0.01, 10.0, step=0.01)
-            clf = SVC(C=c_value)
+            params = dict(C=c_value)
         elif clf_name == 'K-Nearest Neighbors':
             k_value = right.slider('K', 1, 10)
-            clf = KNeighborsClassifier(n_neighbors=k_value)
+            params = dict(n_neighbors=k_value)
         else:
             max_depth = r1.slider('Maximum depth', 2, 10)
             n_estimators = r2.slider(
                 'Numbeor of estimators', 1, 100
             )
-            clf = RandomForestClassifier(
-                n_estimators=n_estimators, max_depth=max_depth, random_state=1234
-            )
+            params = dict(n_estimators=n_estimators, max_depth=max_depth)
 
-        clf.fit(X_train, y_train)
+        clf = fit_classifier(clf_name, dataset_name, **params)
         predicted = clf.predict(X_test)
 
         accuracy = clf.score(X_test, y_test)
@@ -226,8 +288,7 @@ def classifier():
 
     st.write("- Two primary principal components of test data")
 
-    pca = PCA(2)
-    X_projected = pca.fit_transform(X_test)
+    X_projected = project_test_data(dataset_name)
     x1 = X_projected[:, 0]
     x2 = X_projected[:, 1]
 
@@ -235,7 +296,8 @@ def classifier():
 
     for index, y in enumerate([y_test, predicted]):
         im = ax[index].scatter(
-            x1, x2, c=y, alpha=0.8, cmap='viridis'
+            x1, x2, c=y, alpha=0.8, cmap='viridis',
+            vmin=0, vmax=num_classes - 1
         )
         # fig2.colorbar(im, ax=ax[index])
 